@@ -0,0 +1,121 @@
+from typing import Callable, Dict, List
+import threading
+import logging
+import time
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of making a call while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Fail fast after repeated failures of a remote service.
+
+    After failure_threshold consecutive failures the breaker opens and every
+    call is rejected for reset_timeout seconds. It then lets a single trial
+    call through (half-open): success closes it again, failure re-opens it.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 60.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.logger = logging.getLogger('CircuitBreaker')
+        self._state = CircuitBreaker.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._listeners: List[Callable[[str], None]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def add_listener(self, listener: Callable[[str], None]):
+        """Call listener(state) whenever the state changes, from the calling thread."""
+        self._listeners.append(listener)
+
+    def retry_in(self) -> float:
+        """Seconds until an open breaker allows a trial call."""
+        with self._lock:
+            if self._state != CircuitBreaker.OPEN:
+                return 0.0
+            return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def before_call(self):
+        """Raise CircuitOpenError if the call must not be made."""
+        with self._lock:
+            state = self._current_state()
+            if state == CircuitBreaker.OPEN:
+                raise CircuitOpenError(f"{self.name} circuit is open")
+            if state == CircuitBreaker.HALF_OPEN:
+                if self._trial_in_flight:
+                    raise CircuitOpenError(f"{self.name} circuit is half-open, trial call in flight")
+                self._trial_in_flight = True
+                changed = self._set_state(CircuitBreaker.HALF_OPEN)
+            else:
+                changed = False
+        if changed:
+            self._notify(CircuitBreaker.HALF_OPEN)
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._trial_in_flight = False
+            changed = self._set_state(CircuitBreaker.CLOSED)
+        if changed:
+            self._notify(CircuitBreaker.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            changed = False
+            if self._state == CircuitBreaker.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                changed = self._set_state(CircuitBreaker.OPEN)
+        if changed:
+            self.logger.warning(f"{self.name} circuit opened after {self._failures} failures")
+            self._notify(CircuitBreaker.OPEN)
+
+    def reset(self):
+        with self._lock:
+            self._failures = 0
+            self._trial_in_flight = False
+            changed = self._set_state(CircuitBreaker.CLOSED)
+        if changed:
+            self._notify(CircuitBreaker.CLOSED)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                'state': self._current_state(),
+                'consecutive_failures': self._failures,
+            }
+
+    def _current_state(self) -> str:
+        # An open breaker becomes half-open once the reset timeout has passed
+        if (self._state == CircuitBreaker.OPEN
+                and time.monotonic() - self._opened_at >= self.reset_timeout):
+            return CircuitBreaker.HALF_OPEN
+        return self._state
+
+    def _set_state(self, state: str) -> bool:
+        if self._state == state:
+            return False
+        self._state = state
+        return True
+
+    def _notify(self, state: str):
+        self.logger.info(f"{self.name} circuit is {state}")
+        for listener in self._listeners:
+            try:
+                listener(state)
+            except Exception as e:
+                self.logger.error(f"Error in circuit breaker listener: {str(e)}")
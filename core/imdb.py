@@ -1,24 +1,70 @@
 from imdb import IMDb
-from typing import Dict, Optional, List
+from typing import Callable, Dict, Optional, List
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timedelta
+import threading
+import tempfile
 import requests
 import logging
 import json
+import time
 import re
 import os
 
+from core.breaker import CircuitBreaker, CircuitOpenError
+
+# Seconds allowed for a single IMDB request or thumbnail download
+DEFAULT_CALL_TIMEOUT = 15.0
+# Seconds allowed for a whole batch of lookups, e.g. one Scan
+DEFAULT_BATCH_TIMEOUT = 300.0
+
+# IMDbPY info sets fetched per field profile; each info set is one page.
+# Card fields (title, year, cover, plot outline, rating) all come from the
+# 'main' page. That page also carries cast, genres and runtime, which are
+# kept for the details, so opening a movie only needs the 'plot' page.
+FETCH_PROFILES = {
+    'card': ('main',),
+    'details': ('plot',),
+}
+# How long cached details are used before being fetched again
+DETAILS_MAX_AGE = timedelta(days=30)
+
+class TimeBudget:
+    """A deadline shared by every network call made for one batch of work."""
+
+    def __init__(self, seconds: float):
+        self.deadline = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.deadline - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
 class IMDBFetcher:
-    def __init__(self, cache_dir: str, tmp_dir: str):
-        self.ia = IMDb()
+    def __init__(self, cache_dir: str, tmp_dir: str, call_timeout: float = DEFAULT_CALL_TIMEOUT,
+                 offline: bool = False):
+        self.ia = IMDb(timeout=call_timeout)
         self.cache_dir = Path(cache_dir)
         self.tmp_dir = Path(tmp_dir)
+        self.call_timeout = call_timeout
+        self.offline = offline
+        self.breaker = CircuitBreaker('IMDB')
+        self._stats = {'requests': 0, 'failures': 0, 'timeouts': 0, 'rejected': 0,
+                       'movies_fetched': 0, 'details_fetched': 0, 'thumbnail_bytes': 0,
+                       'card_pages': 0, 'card_bytes': 0, 'details_pages': 0, 'details_bytes': 0}
+        self._stats_lock = threading.Lock()
+        # Pages and bytes of the lookup the current IMDBCall thread works for
+        self._call_tally = threading.local()
         self._setup_logging()
+        self._count_page_downloads()
         
         # Create cache directories if they don't exist
         self.cache_dir.mkdir(parents=True, exist_ok=True)
         (self.cache_dir / 'thumbnails').mkdir(exist_ok=True)
         (self.cache_dir / 'metadata').mkdir(exist_ok=True)
+        (self.cache_dir / 'details').mkdir(exist_ok=True)
 
     def _setup_logging(self):
         log_file = self.tmp_dir / f"imdb_{datetime.now().strftime('%Y%m%d')}.log"
@@ -35,9 +81,13 @@ class IMDBFetcher:
         thumbnail_file = self.cache_dir / 'thumbnails' / f"{movie_name}.jpg"
         return metadata_file.exists() and thumbnail_file.exists()
 
+    def get_metadata_path(self, movie_name: str) -> Path:
+        """Path of the cached metadata file for a movie, whether or not it exists."""
+        return self.cache_dir / 'metadata' / f"{movie_name}.json"
+
     def get_cached_info(self, movie_name: str) -> Optional[Dict]:
         """Get movie information from cache if available."""
-        cache_file = self.cache_dir / 'metadata' / f"{movie_name}.json"
+        cache_file = self.get_metadata_path(movie_name)
         if cache_file.exists():
             try:
                 with open(cache_file, 'r') as f:
@@ -57,27 +107,137 @@ class IMDBFetcher:
         name = re.sub(r'\([0-9]{4}\)', '', name)
         return name.strip()
 
-    def get_movie_info(self, movie_name: str, force_update: bool = False) -> Optional[Dict]:
+    def set_offline(self, offline: bool):
+        """In offline mode only cached data is served and IMDB is never contacted."""
+        self.offline = offline
+        if not offline:
+            # Start afresh rather than fail fast on failures from before going offline
+            self.breaker.reset()
+        self.logger.info(f"Offline mode {'enabled' if offline else 'disabled'}")
+
+    def get_stats(self) -> Dict:
+        """Network call counters and circuit breaker state."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        if stats['movies_fetched']:
+            stats['pages_per_movie'] = round(stats['card_pages'] / stats['movies_fetched'], 2)
+            stats['bytes_per_movie'] = (stats['card_bytes'] + stats['thumbnail_bytes']) // stats['movies_fetched']
+        if stats['details_fetched']:
+            stats['details_pages_per_movie'] = round(stats['details_pages'] / stats['details_fetched'], 2)
+            stats['details_bytes_per_movie'] = stats['details_bytes'] // stats['details_fetched']
+        stats['offline'] = self.offline
+        stats['breaker'] = self.breaker.get_stats()
+        stats['breaker']['retry_in'] = round(self.breaker.retry_in(), 1)
+        return stats
+
+    def _count(self, counter: str, amount: int = 1):
+        with self._stats_lock:
+            self._stats[counter] += amount
+
+    def _count_page_downloads(self):
+        """Wrap IMDbPY's page retrieval to tally pages and bytes per lookup."""
+        url_opener = getattr(self.ia, 'urlOpener', None)
+        if url_opener is None:
+            return
+        retrieve_unicode = url_opener.retrieve_unicode
+
+        def counting_retrieve_unicode(url, size=-1):
+            content = retrieve_unicode(url, size=size)
+            tally = getattr(self._call_tally, 'tally', None)
+            if tally is not None:
+                tally['pages'] += 1
+                tally['bytes'] += len(content.encode('utf-8'))
+            return content
+
+        url_opener.retrieve_unicode = counting_retrieve_unicode
+
+    def _call_timeout(self, budget: Optional[TimeBudget]) -> float:
+        """Timeout for the next call: the per-call limit, capped by the batch budget."""
+        if budget is None:
+            return self.call_timeout
+        if budget.expired:
+            raise TimeoutError("Batch time budget exhausted")
+        return min(self.call_timeout, budget.remaining())
+
+    def _count_lookup(self, profile: str, tally: Dict):
+        """Add a successful lookup's pages and bytes to its profile's counters.
+
+        Failed lookups are left out so the per movie figures only reflect
+        lookups that produced data.
+        """
+        with self._stats_lock:
+            self._stats['movies_fetched' if profile == 'card' else 'details_fetched'] += 1
+            self._stats[f'{profile}_pages'] += tally['pages']
+            self._stats[f'{profile}_bytes'] += tally['bytes']
+
+    def _call_imdb(self, func: Callable, *args, budget: Optional[TimeBudget] = None,
+                   tally: Optional[Dict] = None):
+        """Run an IMDbPY call under the circuit breaker and a hard timeout."""
+        timeout = self._call_timeout(budget)
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            self._count('rejected')
+            raise
+        self._count('requests')
+        outcome = {}
+        finished = threading.Event()
+
+        def run():
+            self._call_tally.tally = tally
+            try:
+                outcome['result'] = func(*args)
+            except Exception as e:
+                outcome['error'] = e
+            finally:
+                finished.set()
+
+        # IMDbPY calls cannot be interrupted, so each one gets its own daemon
+        # thread that is abandoned once its timeout is spent. The timeout starts
+        # with the call itself, an abandoned call never holds up later ones,
+        # and closing the app does not wait for it.
+        threading.Thread(target=run, name='IMDBCall', daemon=True).start()
+        if not finished.wait(timeout):
+            self._count('timeouts')
+            self.breaker.record_failure()
+            raise TimeoutError(f"IMDB call timed out after {timeout:.1f}s")
+        if 'error' in outcome:
+            self._count('failures')
+            self.breaker.record_failure()
+            raise outcome['error']
+        self.breaker.record_success()
+        return outcome['result']
+
+    def get_movie_info(self, movie_name: str, force_update: bool = False,
+                       with_thumbnail: bool = True,
+                       budget: Optional[TimeBudget] = None) -> Optional[Dict]:
         """
         Get movie information from cache or IMDB.
         If force_update is True, ignore cache and fetch fresh data.
+        If with_thumbnail is False, the caller downloads the thumbnail separately.
+        budget bounds the total time spent by a batch of lookups.
+        In offline mode, or while the IMDB circuit is open, only the cache is used.
         """
         print(f"Fetching info for movie: {movie_name}")
         
         # Check cache first unless force_update is True
-        if not force_update:
+        if not force_update or self.offline:
             cached_info = self.get_cached_info(movie_name)
             if cached_info:
                 print(f"Using cached data for: {movie_name}")
                 self.logger.info(f"Using cached data for: {movie_name}")
                 return cached_info
+            if self.offline:
+                self.logger.info(f"Offline, no cached data for: {movie_name}")
+                return None
 
         try:
             # Clean up the movie name for better search results
             search_name = self.clean_movie_name(movie_name)
             print(f"Searching IMDB for: {search_name}")
             
-            movies = self.ia.search_movie(search_name)
+            tally = {'pages': 0, 'bytes': 0}
+            movies = self._call_imdb(self.ia.search_movie, search_name, budget=budget, tally=tally)
             if not movies:
                 print(f"No movies found for: {search_name}")
                 self.logger.warning(f"No movies found for: {search_name}")
@@ -86,15 +246,17 @@ class IMDBFetcher:
             movie = movies[0]
             print(f"Found movie: {movie.get('title')} ({movie.get('year')})")
             
-            # Get full movie details
-            self.ia.update(movie)
+            # Only the card fields; details are loaded by get_movie_details
+            self._call_imdb(self.ia.update, movie, FETCH_PROFILES['card'], budget=budget, tally=tally)
+            self._count_lookup('card', tally)
 
             movie_info = {
                 'title': movie.get('title'),
                 'year': movie.get('year'),
                 'cover_url': movie.get('cover url', ''),
-                'plot': movie.get('plot', [''])[0] if movie.get('plot') else '',
+                'plot': movie.get('plot outline') or self._first_plot(movie),
                 'rating': movie.get('rating', 0.0),
+                'imdb_id': movie.movieID,
                 'cached_at': datetime.now().isoformat(),
             }
 
@@ -105,30 +267,182 @@ class IMDBFetcher:
             with open(cache_file, 'w') as f:
                 json.dump(movie_info, f)
 
+            # Keep the details the main page already carried; replacing the
+            # file also drops a full plot cached for a previous match
+            self._save_details(movie_name, self._main_page_details(movie))
+
             # Download and cache thumbnail
-            if movie_info['cover_url']:
+            if with_thumbnail and movie_info['cover_url']:
                 print(f"Downloading thumbnail from: {movie_info['cover_url']}")
-                self._download_thumbnail(movie_info['cover_url'], movie_name)
+                self._download_thumbnail(movie_info['cover_url'], movie_name, budget)
 
             self.logger.info(f"Cached new data for: {movie_name}")
             return movie_info
 
+        except (CircuitOpenError, TimeoutError) as e:
+            # Fail fast, but still show what we have
+            error_msg = f"IMDB unavailable for {movie_name}: {str(e)}"
+            print(error_msg)
+            self.logger.warning(error_msg)
+            return self.get_cached_info(movie_name)
+
         except Exception as e:
             error_msg = f"Error fetching movie info for {movie_name}: {str(e)}"
             print(error_msg)
             self.logger.error(error_msg)
             return None
 
-    def _download_thumbnail(self, url: str, movie_name: str):
+    def _first_plot(self, movie) -> str:
+        # Plot summaries come as 'text::author'
+        plots = movie.get('plot')
+        return plots[0].split('::')[0] if plots else ''
+
+    def get_cached_details(self, movie_name: str) -> Optional[Dict]:
+        """Get heavy movie details (full plot, cast, genres, runtime) from cache if available."""
+        cache_file = self.cache_dir / 'details' / f"{movie_name}.json"
+        if cache_file.exists():
+            try:
+                with open(cache_file, 'r') as f:
+                    return json.load(f)
+            except Exception as e:
+                self.logger.error(f"Error reading details cache for {movie_name}: {str(e)}")
+        return None
+
+    def _details_are_fresh(self, details: Dict) -> bool:
+        try:
+            cached_at = datetime.fromisoformat(details['cached_at'])
+        except (KeyError, TypeError, ValueError):
+            return False
+        return datetime.now() - cached_at < DETAILS_MAX_AGE
+
+    def _main_page_details(self, movie) -> Dict:
+        """Detail fields that IMDbPY's 'main' info set provides."""
+        return {
+            'cast': [person.get('name') for person in movie.get('cast', [])[:10]],
+            'genres': movie.get('genres', []),
+            'runtime': (movie.get('runtimes') or [''])[0],
+        }
+
+    def _save_details(self, movie_name: str, details: Dict):
+        cache_file = self.cache_dir / 'details' / f"{movie_name}.json"
+        with open(cache_file, 'w') as f:
+            json.dump(details, f)
+
+    def get_movie_details(self, movie_name: str, force_update: bool = False,
+                          budget: Optional[TimeBudget] = None) -> Optional[Dict]:
+        """
+        Get heavy movie details, loaded lazily when a movie is opened.
+        Cast, genres and runtime are kept from the card lookup, so only the
+        full plot page is fetched. Details are cached separately from the card
+        info and refetched after DETAILS_MAX_AGE; a stale copy is returned if
+        IMDB cannot be reached.
+        """
+        cached_details = self.get_cached_details(movie_name)
+        if cached_details and not force_update and self._details_are_fresh(cached_details):
+            self.logger.info(f"Using cached details for: {movie_name}")
+            return cached_details
+        if self.offline:
+            return cached_details
+
+        try:
+            tally = {'pages': 0, 'bytes': 0}
+            cached_info = self.get_cached_info(movie_name) or {}
+            movie_id = cached_info.get('imdb_id')
+            if not movie_id:
+                # Card cached before IMDB ids were stored
+                movies = self._call_imdb(self.ia.search_movie, self.clean_movie_name(movie_name),
+                                         budget=budget, tally=tally)
+                if not movies:
+                    self.logger.warning(f"No movies found for: {movie_name}")
+                    return cached_details
+                movie_id = movies[0].movieID
+
+            # Details cached before the card kept main page fields, or a
+            # forced refresh, need the main page as well
+            has_main_fields = bool(cached_details) and 'cast' in cached_details
+            info_sets = FETCH_PROFILES['details']
+            if force_update or not has_main_fields:
+                info_sets = FETCH_PROFILES['card'] + info_sets
+
+            print(f"Fetching details for movie: {movie_name}")
+            movie = self._call_imdb(self.ia.get_movie, movie_id, info_sets,
+                                    budget=budget, tally=tally)
+            self._count_lookup('details', tally)
+
+            if 'main' in info_sets:
+                details = self._main_page_details(movie)
+            else:
+                details = {key: cached_details.get(key) for key in ('cast', 'genres', 'runtime')}
+            details['plot'] = self._first_plot(movie) or cached_info.get('plot', '')
+            details['cached_at'] = datetime.now().isoformat()
+
+            self._save_details(movie_name, details)
+
+            self.logger.info(f"Cached new details for: {movie_name}")
+            return details
+
+        except Exception as e:
+            error_msg = f"Error fetching details for {movie_name}: {str(e)}"
+            print(error_msg)
+            self.logger.error(error_msg)
+            return cached_details
+
+    def download_thumbnail(self, movie_name: str,
+                           budget: Optional[TimeBudget] = None) -> Optional[str]:
+        """Download the thumbnail for a movie with cached metadata, returning its path."""
+        cached_info = self.get_cached_info(movie_name)
+        if cached_info and cached_info.get('cover_url') and not self.offline:
+            self._download_thumbnail(cached_info['cover_url'], movie_name, budget)
+        return self.get_cached_thumbnail_path(movie_name)
+
+    def _download_thumbnail(self, url: str, movie_name: str,
+                            budget: Optional[TimeBudget] = None):
         """Download and cache movie thumbnail."""
         thumbnail_path = self.cache_dir / 'thumbnails' / f"{movie_name}.jpg"
         
         try:
-            response = requests.get(url)
+            timeout = self._call_timeout(budget)
+            self.breaker.before_call()
+        except (CircuitOpenError, TimeoutError) as e:
+            if isinstance(e, CircuitOpenError):
+                self._count('rejected')
+            self.logger.warning(f"Skipping thumbnail for {movie_name}: {str(e)}")
+            return
+
+        try:
+            self._count('requests')
+            try:
+                response = requests.get(url, timeout=timeout)
+            except requests.exceptions.Timeout:
+                self._count('timeouts')
+                self.breaker.record_failure()
+                raise
+            except Exception:
+                # Every outcome must settle the breaker, or a failed half-open
+                # trial would keep it half-open forever
+                self._count('failures')
+                self.breaker.record_failure()
+                raise
+            # The image server answering with an error of its own is an
+            # outage; anything else means it is reachable
+            if response.status_code >= 500:
+                self._count('failures')
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
             response.raise_for_status()
+            self._count('thumbnail_bytes', len(response.content))
             
-            with open(thumbnail_path, 'wb') as f:
-                f.write(response.content)
+            # Write beside the target and swap it in, so readers such as the
+            # catalog server never see a half-written JPEG
+            fd, tmp_path = tempfile.mkstemp(dir=str(thumbnail_path.parent), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(response.content)
+                os.replace(tmp_path, thumbnail_path)
+            except Exception:
+                os.unlink(tmp_path)
+                raise
                 
             self.logger.info(f"Downloaded thumbnail for: {movie_name}")
             
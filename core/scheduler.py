@@ -0,0 +1,165 @@
+from typing import Any, Callable, Dict, Hashable, List, Optional
+import itertools
+import threading
+import logging
+import heapq
+
+# Lower values run first.
+PRIORITY_USER = 0
+PRIORITY_VISIBLE = 1
+PRIORITY_BACKGROUND = 2
+
+
+class WorkItem:
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    CANCELLED = 'cancelled'
+
+    def __init__(self, key: Hashable, func: Callable, args: tuple, priority: int,
+                 group: Optional[str], callback: Optional[Callable[[Any], None]],
+                 budget: Any = None):
+        self.key = key
+        self.func = func
+        self.args = args
+        self.priority = priority
+        self.group = group
+        self.callback = callback
+        self.budget = budget
+        self.state = WorkItem.PENDING
+
+    @property
+    def cancelled(self) -> bool:
+        return self.state == WorkItem.CANCELLED
+
+
+class PriorityWorkQueue:
+    """Run keyed jobs on a small thread pool, most urgent priority first.
+
+    Submitting a key that is already queued reuses the queued job and raises
+    its priority if the new one is more urgent. Jobs are tagged with a group
+    (the category being shown) so a whole view's work can be dropped at once.
+
+    A background job may carry a batch budget, passed to func as budget=.
+    It only bounds background work: promoting the job to a more urgent
+    priority drops it, so user and on-screen work gets a fresh deadline.
+    """
+
+    def __init__(self, workers: int = 4):
+        self.logger = logging.getLogger('PriorityWorkQueue')
+        self._heap: List[tuple] = []
+        self._items: Dict[Hashable, WorkItem] = {}
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._running = True
+        self._threads = []
+        for i in range(workers):
+            thread = threading.Thread(target=self._worker, name=f'PriorityWorkQueue-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, key: Hashable, func: Callable, *args, priority: int = PRIORITY_BACKGROUND,
+               group: Optional[str] = None, callback: Optional[Callable[[Any], None]] = None,
+               budget: Any = None) -> WorkItem:
+        """Queue func(*args); callback(result) runs on the worker thread when it finishes."""
+        with self._cond:
+            item = self._items.get(key)
+            if item is not None:
+                # Already queued or in flight: share it rather than repeat the work
+                if item.cancelled:
+                    # Still running for a view that was left; want its result again
+                    item.state = WorkItem.RUNNING
+                item.group = group
+                item.callback = callback or item.callback
+                if (item.state == WorkItem.PENDING and priority >= PRIORITY_BACKGROUND
+                        and item.priority >= PRIORITY_BACKGROUND):
+                    # A new batch (e.g. another Scan) brings a fresh budget
+                    item.budget = budget
+                if item.state == WorkItem.PENDING and priority < item.priority:
+                    self._push(item, priority)
+                return item
+            item = WorkItem(key, func, args, priority, group, callback,
+                            budget if priority >= PRIORITY_BACKGROUND else None)
+            self._items[key] = item
+            self._push(item, priority)
+            return item
+
+    def reprioritize(self, key: Hashable, priority: int):
+        """Move a queued job to a new priority; no-op if it is not pending."""
+        with self._cond:
+            item = self._items.get(key)
+            if item is not None and item.state == WorkItem.PENDING and item.priority != priority:
+                self._push(item, priority)
+
+    def cancel_group(self, group: str):
+        """Drop queued jobs of a group and discard results of its running ones."""
+        with self._cond:
+            for key, item in list(self._items.items()):
+                if item.group == group and not item.cancelled:
+                    # Running items stay tracked until they finish, so a
+                    # resubmit of the same key reuses them
+                    if item.state == WorkItem.PENDING:
+                        del self._items[key]
+                    item.state = WorkItem.CANCELLED
+
+    def cancel_all(self):
+        with self._cond:
+            for item in self._items.values():
+                item.state = WorkItem.CANCELLED
+            self._items.clear()
+            self._heap.clear()
+
+    def pending_count(self) -> int:
+        with self._cond:
+            return sum(1 for item in self._items.values() if item.state == WorkItem.PENDING)
+
+    def shutdown(self):
+        self.cancel_all()
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+
+    def _push(self, item: WorkItem, priority: int):
+        # Older heap entries for the same item become stale and are skipped
+        # when popped, which keeps reprioritizing O(log n).
+        item.priority = priority
+        if priority < PRIORITY_BACKGROUND:
+            item.budget = None
+        heapq.heappush(self._heap, (priority, next(self._counter), item))
+        self._cond.notify()
+
+    def _next_item(self) -> Optional[WorkItem]:
+        with self._cond:
+            while self._running:
+                while self._heap:
+                    priority, _, item = heapq.heappop(self._heap)
+                    if item.state == WorkItem.PENDING and item.priority == priority:
+                        item.state = WorkItem.RUNNING
+                        return item
+                self._cond.wait()
+            return None
+
+    def _worker(self):
+        while True:
+            item = self._next_item()
+            if item is None:
+                return
+            try:
+                if item.budget is not None:
+                    result = item.func(*item.args, budget=item.budget)
+                else:
+                    result = item.func(*item.args)
+            except Exception as e:
+                self.logger.error(f"Error running {item.key}: {str(e)}")
+                result = None
+            with self._cond:
+                if self._items.get(item.key) is item:
+                    del self._items[item.key]
+                if item.cancelled:
+                    continue
+                item.state = WorkItem.DONE
+            if item.callback:
+                try:
+                    item.callback(result)
+                except Exception as e:
+                    self.logger.error(f"Error in callback for {item.key}: {str(e)}")
@@ -0,0 +1,299 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, quote, unquote
+from typing import Dict, List, Optional, Tuple
+from pathlib import Path
+import threading
+import hashlib
+import logging
+import json
+import os
+
+from core.scanner import MovieScanner
+from core.imdb import IMDBFetcher
+
+DEFAULT_PORT = 8765
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class _CatalogHTTPServer(ThreadingHTTPServer):
+    # One thread per connection; a deep accept backlog keeps bursts of
+    # clients from being refused while handler threads spin up.
+    daemon_threads = True
+    request_queue_size = 512
+
+    def __init__(self, address, handler, catalog: 'CatalogServer'):
+        self.catalog = catalog
+        super().__init__(address, handler)
+
+
+class CatalogRequestHandler(BaseHTTPRequestHandler):
+    server_version = "MovieDirectory/1.0"
+    protocol_version = "HTTP/1.1"
+    # Drop idle keep-alive and slow clients instead of holding their thread forever
+    timeout = 30
+
+    def log_message(self, format, *args):
+        self.server.catalog.logger.info("%s - %s" % (self.address_string(), format % args))
+
+    def do_GET(self):
+        self._handle(send_body=True)
+
+    def do_HEAD(self):
+        self._handle(send_body=False)
+
+    def _handle(self, send_body: bool):
+        catalog = self.server.catalog
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        try:
+            if url.path == '/api/categories':
+                self._send_json({'categories': sorted(catalog.get_categories())}, send_body)
+            elif url.path == '/api/movies':
+                category = self._param(query, 'category')
+                if category is None:
+                    self._send_error(400, "Missing 'category' parameter")
+                    return
+                movies = catalog.list_movies(category)
+                if movies is None:
+                    self._send_error(404, f"Unknown category: {category}")
+                    return
+                self._send_page(movies, query, send_body)
+            elif url.path == '/api/search':
+                text = self._param(query, 'q', '')
+                movies = catalog.search_movies(text, self._param(query, 'category'))
+                self._send_page(movies, query, send_body)
+            elif url.path == '/api/status':
+                self._send_json({'imdb': catalog.imdb.get_stats()}, send_body)
+            elif url.path.startswith('/thumbnails/'):
+                self._send_thumbnail(unquote(url.path[len('/thumbnails/'):]), send_body)
+            else:
+                self._send_error(404, "Not found")
+        except ValueError as e:
+            self._send_error(400, str(e))
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        except Exception as e:
+            catalog.logger.error(f"Error handling {self.path}: {str(e)}")
+            self._send_error(500, "Internal server error")
+
+    def _param(self, query: Dict[str, List[str]], name: str, default: Optional[str] = None) -> Optional[str]:
+        values = query.get(name)
+        return values[0] if values else default
+
+    def _send_page(self, movies: List[Dict], query: Dict[str, List[str]], send_body: bool):
+        try:
+            page = int(self._param(query, 'page', '1'))
+            per_page = int(self._param(query, 'per_page', str(DEFAULT_PAGE_SIZE)))
+        except ValueError:
+            raise ValueError("'page' and 'per_page' must be integers")
+        if page < 1 or per_page < 1:
+            raise ValueError("'page' and 'per_page' must be positive")
+        per_page = min(per_page, MAX_PAGE_SIZE)
+        start = (page - 1) * per_page
+        # Only the movies on this page pay for metadata and thumbnail lookups
+        catalog = self.server.catalog
+        self._send_json({
+            'page': page,
+            'per_page': per_page,
+            'total': len(movies),
+            'movies': [catalog.with_metadata(movie) for movie in movies[start:start + per_page]],
+        }, send_body)
+
+    def _send_json(self, payload: Dict, send_body: bool):
+        body = json.dumps(payload, sort_keys=True).encode('utf-8')
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        if self._etag_matches(etag):
+            self._send_not_modified(etag)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def _send_thumbnail(self, file_name: str, send_body: bool):
+        path = self.server.catalog.get_thumbnail_path(file_name)
+        if path is None:
+            self._send_error(404, "Thumbnail not found")
+            return
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            etag = '"%x-%x"' % (stat.st_mtime_ns, stat.st_size)
+            if self._etag_matches(etag):
+                self._send_not_modified(etag)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/jpeg')
+            self.send_header('Content-Length', str(stat.st_size))
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'max-age=3600')
+            self.end_headers()
+            if send_body:
+                # Hand the file straight to the kernel (os.sendfile where available)
+                self.connection.sendfile(f, 0, stat.st_size)
+
+    def _etag_matches(self, etag: str) -> bool:
+        header = self.headers.get('If-None-Match')
+        if not header:
+            return False
+        tags = [tag.strip() for tag in header.split(',')]
+        return '*' in tags or etag in tags or f"W/{etag}" in tags
+
+    def _send_not_modified(self, etag: str):
+        self.send_response(304)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def _send_error(self, code: int, message: str):
+        body = json.dumps({'error': message}).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+
+class CatalogServer:
+    """Serve the movie catalog as JSON over HTTP to other devices on the LAN."""
+
+    def __init__(self, scanner: MovieScanner, imdb: IMDBFetcher, base_directory: str,
+                 host: str = '0.0.0.0', port: int = DEFAULT_PORT):
+        self.scanner = scanner
+        self.imdb = imdb
+        self.base_directory = base_directory
+        self.host = host
+        self.port = port
+        self.logger = logging.getLogger('CatalogServer')
+        self._httpd = None
+        self._thread = None
+        # category path -> (directory mtime, scanned movies)
+        self._scan_cache: Dict[str, Tuple[int, List[Dict]]] = {}
+        # movie name -> (metadata file mtime, parsed metadata)
+        self._metadata_cache: Dict[str, Tuple[int, Dict]] = {}
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start serving on a background thread."""
+        if self._httpd is not None:
+            return
+        self._httpd = _CatalogHTTPServer((self.host, self.port), CatalogRequestHandler, self)
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever,
+                                        name='CatalogServer', daemon=True)
+        self._thread.start()
+        self.logger.info(f"Catalog server listening on {self.host}:{self.port}")
+
+    def stop(self):
+        if self._httpd is None:
+            return
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join()
+        self._httpd = None
+        self._thread = None
+        self.logger.info("Catalog server stopped")
+
+    @property
+    def is_running(self) -> bool:
+        return self._httpd is not None
+
+    def set_base_directory(self, base_directory: str):
+        with self._lock:
+            self.base_directory = base_directory
+            self._scan_cache.clear()
+            self._metadata_cache.clear()
+
+    def get_categories(self) -> Dict[str, str]:
+        """Map category names to their directories under the base directory."""
+        categories = {}
+        if not self.base_directory:
+            return categories
+        try:
+            for item in Path(self.base_directory).iterdir():
+                if item.is_dir():
+                    categories[item.name] = str(item)
+        except Exception as e:
+            self.logger.error(f"Error loading categories: {str(e)}")
+        return categories
+
+    def list_movies(self, category: str) -> Optional[List[Dict]]:
+        """List a category's scanned movies, or None if unknown. See with_metadata."""
+        category_dir = self.get_categories().get(category)
+        if category_dir is None:
+            return None
+        return self._scan(category_dir)
+
+    def search_movies(self, text: str, category: Optional[str] = None) -> List[Dict]:
+        """Case-insensitive search over directory names and cached titles."""
+        text = text.lower()
+        categories = self.get_categories()
+        if category is not None:
+            categories = {category: categories[category]} if category in categories else {}
+        results = []
+        for name in sorted(categories):
+            for movie in self._scan(categories[name]):
+                if text in movie['name'].lower():
+                    results.append(movie)
+                    continue
+                cached_info = self._get_metadata(movie['name'])
+                if cached_info and text in str(cached_info.get('title') or '').lower():
+                    results.append(movie)
+        return results
+
+    def with_metadata(self, movie: Dict) -> Dict:
+        """Public view of a scanned movie, with its cached IMDB info and thumbnail URL."""
+        movie = {
+            'name': movie['name'],
+            'category': movie['category'],
+            'has_movie_file': bool(movie.get('movie_file')),
+        }
+        cached_info = self._get_metadata(movie['name'])
+        if cached_info:
+            movie.update(cached_info)
+        if self.imdb.get_cached_thumbnail_path(movie['name']):
+            movie['thumbnail_url'] = '/thumbnails/' + quote(movie['name'] + '.jpg')
+        return movie
+
+    def get_thumbnail_path(self, file_name: str) -> Optional[str]:
+        """Resolve a thumbnail file name inside the thumbnail cache."""
+        if not file_name.endswith('.jpg') or Path(file_name).name != file_name:
+            return None
+        return self.imdb.get_cached_thumbnail_path(file_name[:-len('.jpg')])
+
+    def _scan(self, category_dir: str) -> List[Dict]:
+        # Adding or removing a movie folder bumps the category directory's
+        # mtime, so it is enough to rescan only when that changes.
+        try:
+            mtime = os.stat(category_dir).st_mtime_ns
+        except OSError:
+            return []
+        with self._lock:
+            cached = self._scan_cache.get(category_dir)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        movies = sorted(self.scanner.scan_directory(category_dir), key=lambda m: m['name'].lower())
+        with self._lock:
+            self._scan_cache[category_dir] = (mtime, movies)
+        return movies
+
+    def _get_metadata(self, movie_name: str) -> Optional[Dict]:
+        # Re-read a metadata file only when a fetch has rewritten it
+        try:
+            mtime = os.stat(self.imdb.get_metadata_path(movie_name)).st_mtime_ns
+        except OSError:
+            return None
+        with self._lock:
+            cached = self._metadata_cache.get(movie_name)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        cached_info = self.imdb.get_cached_info(movie_name)
+        if cached_info is not None:
+            with self._lock:
+                self._metadata_cache[movie_name] = (mtime, cached_info)
+        return cached_info
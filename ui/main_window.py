@@ -5,18 +5,23 @@ from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
 from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QPushButton, QLineEdit, QComboBox, QLabel,
                              QScrollArea, QFileDialog, QMessageBox, QTabWidget,
-                             QApplication, QGridLayout)
-from PyQt6.QtCore import Qt, QThread, pyqtSignal
-from PyQt6.QtGui import QPixmap, QIcon
+                             QApplication, QGridLayout, QCheckBox, QSpinBox)
+from PyQt6.QtCore import Qt, QThread, QObject, QRect, QTimer, pyqtSignal
+from PyQt6.QtGui import QPixmap, QImage, QIcon
 import os
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 import json
 import subprocess
+from html import escape
 from sys import platform
 
 from core.scanner import MovieScanner
-from core.imdb import IMDBFetcher
+from core.imdb import IMDBFetcher, TimeBudget, DEFAULT_BATCH_TIMEOUT
+from core.breaker import CircuitBreaker
+from core.server import CatalogServer, DEFAULT_PORT
+from core.scheduler import (PriorityWorkQueue, PRIORITY_USER, PRIORITY_VISIBLE,
+                            PRIORITY_BACKGROUND)
 
 class ScanWorker(QThread):
     progress = pyqtSignal(dict)
@@ -58,6 +63,21 @@ class ScanWorker(QThread):
             print(f"Error in ScanWorker: {str(e)}")
             self.finished.emit()
 
+class WorkSignals(QObject):
+    """Carries PriorityWorkQueue results from worker threads to the UI thread."""
+    info_ready = pyqtSignal(str, object)
+    thumbnail_ready = pyqtSignal(str, object)
+    poster_ready = pyqtSignal(str, object)
+    breaker_changed = pyqtSignal(str)
+    details_ready = pyqtSignal(str, object)
+
+def decode_poster(thumbnail_path: str) -> Optional[QImage]:
+    """Decode and scale a thumbnail off the UI thread (QImage, unlike QPixmap, is thread-safe)."""
+    image = QImage(thumbnail_path)
+    if image.isNull():
+        return None
+    return image.scaled(100, 150, Qt.AspectRatioMode.KeepAspectRatio)
+
 class MainWindow(QMainWindow):
     def __init__(self):
         self.scan_worker = None
@@ -110,11 +130,18 @@ class MainWindow(QMainWindow):
         self.base_directory = self.config.get('base_directory', '')
         self.categories = self.config.get('categories', {})
         self.last_category = self.config.get('last_category', '')
+        self.catalog_server_enabled = self.config.get('catalog_server_enabled', False)
+        self.catalog_server_port = self.config.get('catalog_server_port', DEFAULT_PORT)
+        self.offline_mode = self.config.get('offline_mode', False)
+        self.imdb.set_offline(self.offline_mode)
 
     def save_config(self):
         self.config['base_directory'] = self.base_directory
         self.config['categories'] = self.categories
         self.config['last_category'] = self.category_combo.currentText()
+        self.config['catalog_server_enabled'] = self.catalog_server_enabled
+        self.config['catalog_server_port'] = self.catalog_server_port
+        self.config['offline_mode'] = self.offline_mode
         with open(self.config_file, 'w') as f:
             json.dump(self.config, f)
 
@@ -163,6 +190,8 @@ class MainWindow(QMainWindow):
         scroll = QScrollArea()
         scroll.setWidgetResizable(True)
         scroll.setMinimumHeight(400)
+        scroll.verticalScrollBar().valueChanged.connect(self.prioritize_visible)
+        self.scroll_area = scroll
         
         movies_container = QWidget()
         movies_container.setStyleSheet("QWidget { background-color: #f5f5f5; }")
@@ -187,6 +216,14 @@ class MainWindow(QMainWindow):
 
         self.tab_widget.addTab(movies_tab, "Movies")
 
+        # IMDB availability, kept current by update_imdb_status
+        self.imdb_status_label = QLabel()
+        self.statusBar().addPermanentWidget(self.imdb_status_label)
+        self.imdb_status_timer = QTimer(self)
+        self.imdb_status_timer.setInterval(1000)
+        self.imdb_status_timer.timeout.connect(self.update_imdb_status)
+        self.update_imdb_status()
+
         # Settings tab
         settings_tab = QWidget()
         settings_layout = QVBoxLayout(settings_tab)
@@ -203,6 +240,33 @@ class MainWindow(QMainWindow):
         base_dir_layout.addWidget(select_dir_btn)
 
         settings_layout.addLayout(base_dir_layout)
+
+        # LAN catalog server
+        server_layout = QHBoxLayout()
+        self.server_checkbox = QCheckBox("Share catalog on local network")
+        self.server_checkbox.setChecked(self.catalog_server_enabled)
+        self.server_checkbox.toggled.connect(self.toggle_catalog_server)
+        server_layout.addWidget(self.server_checkbox)
+
+        self.server_port_input = QSpinBox()
+        self.server_port_input.setRange(1024, 65535)
+        self.server_port_input.setValue(self.catalog_server_port)
+        self.server_port_input.setEnabled(not self.catalog_server_enabled)
+        server_layout.addWidget(QLabel("Port:"))
+        server_layout.addWidget(self.server_port_input)
+
+        self.server_status_label = QLabel("")
+        self.server_status_label.setStyleSheet("color: gray; font-size: 12px;")
+        server_layout.addWidget(self.server_status_label)
+        server_layout.addStretch()
+
+        settings_layout.addLayout(server_layout)
+
+        # Offline mode
+        self.offline_checkbox = QCheckBox("Offline mode (use cached IMDB info only)")
+        self.offline_checkbox.setChecked(self.offline_mode)
+        self.offline_checkbox.toggled.connect(self.toggle_offline_mode)
+        settings_layout.addWidget(self.offline_checkbox)
         settings_layout.addStretch()
 
         self.tab_widget.addTab(settings_tab, "Settings")
@@ -227,6 +291,8 @@ class MainWindow(QMainWindow):
             self.save_config()
             self.load_categories()
             self.update_category_combo()
+            if self.catalog_server is not None:
+                self.catalog_server.set_base_directory(dir_path)
 
     def load_categories(self):
         self.categories = {}
@@ -242,6 +308,9 @@ class MainWindow(QMainWindow):
     def category_changed(self, category):
         if category in self.categories:
             print(f"Selected category: {category}")
+            # Work queued for the category being left is no longer wanted
+            if self.current_category:
+                self.work_queue.cancel_group(self.current_category)
             self.clear_movies()
             self.scan_directory()
             # Save config when category changes
@@ -263,6 +332,21 @@ class MainWindow(QMainWindow):
         self.config_file.parent.mkdir(parents=True, exist_ok=True)
         
         self.scan_worker = None
+        self.catalog_server = None
+        self.current_category = None
+        self.work_queue = PriorityWorkQueue()
+        self.work_signals = WorkSignals()
+        self.work_signals.info_ready.connect(self.on_movie_info_ready)
+        self.work_signals.thumbnail_ready.connect(self.on_thumbnail_ready)
+        self.work_signals.poster_ready.connect(self.on_poster_ready)
+        self.work_signals.breaker_changed.connect(self.update_imdb_status)
+        self.work_signals.details_ready.connect(self.on_movie_details_ready)
+        self.imdb.breaker.add_listener(self.work_signals.breaker_changed.emit)
+        self.movie_infos: Dict[str, Dict] = {}
+        self.movie_widgets: Dict[str, QWidget] = {}
+        self.thumbnail_labels: Dict[str, QLabel] = {}
+        self.fetch_buttons: Dict[str, QPushButton] = {}
+        self.user_requested = set()
         self.current_row = 0
         self.current_col = 0
         self.scan_btn = None
@@ -273,6 +357,9 @@ class MainWindow(QMainWindow):
         # Load categories if base directory is set
         if self.base_directory:
             self.load_categories()
+
+        if self.catalog_server_enabled:
+            self.start_catalog_server()
             
     def scan_directory(self, force_update=False):
         category = self.category_combo.currentText()
@@ -283,9 +370,20 @@ class MainWindow(QMainWindow):
             print(f"Scanning directory: {self.categories[category]}")
             movies = self.scanner.scan_directory(self.categories[category])
             self.clear_movies()
+            self.current_category = category
+            # All lookups started by one scan share a single time budget
+            budget = TimeBudget(DEFAULT_BATCH_TIMEOUT) if force_update else None
             
             for movie in movies:
+                cached_info = self.imdb.get_cached_info(movie['name'])
+                if cached_info:
+                    movie.update(cached_info)
                 self.add_movie(movie)
+                if force_update and not cached_info:
+                    self.queue_movie_info(movie['name'], PRIORITY_BACKGROUND, budget)
+
+            # Once the grid is laid out, pull on-screen cards to the front
+            QTimer.singleShot(0, self.prioritize_visible)
                 
         except Exception as e:
             print(f"Error scanning directory: {str(e)}")
@@ -299,7 +397,7 @@ class MainWindow(QMainWindow):
             self.scan_worker.wait()
             self.scan_worker = None
 
-    def add_movie(self, movie_info: Dict):
+    def add_movie(self, movie_info: Dict, position: Optional[Tuple[int, int]] = None):
         print(f"Adding movie to UI: {movie_info['name']}")
         try:
             movie_widget = QWidget()
@@ -319,8 +417,17 @@ class MainWindow(QMainWindow):
             thumbnail_label.setFixedSize(100, 150)
             thumbnail_path = self.imdb.get_cached_thumbnail_path(movie_info['name'])
             if thumbnail_path:
-                pixmap = QPixmap(thumbnail_path)
-                thumbnail_label.setPixmap(pixmap.scaled(100, 150, Qt.AspectRatioMode.KeepAspectRatio))
+                # Decoded on the work queue; shown by on_poster_ready
+                thumbnail_label.setStyleSheet(
+                    "QLabel { background-color: #eee; border: 1px solid #ddd; }"
+                )
+                self.thumbnail_labels[movie_info['name']] = thumbnail_label
+                self.work_queue.submit(
+                    ('poster', movie_info['name']), decode_poster, thumbnail_path,
+                    priority=self.priority_for(movie_info['name']),
+                    group=self.current_category,
+                    callback=lambda image, name=movie_info['name']: self.work_signals.poster_ready.emit(name, image)
+                )
             else:
                 # Set a placeholder with movie name
                 thumbnail_label.setStyleSheet(
@@ -384,6 +491,7 @@ class MainWindow(QMainWindow):
                     lambda checked, btn=fetch_btn: self.fetch_movie_info(movie_info['name'], btn)
                 )
                 info_layout.addWidget(fetch_btn)
+                self.fetch_buttons[movie_info['name']] = fetch_btn
                 
             info_layout.addStretch()  # Push buttons to bottom
             right_layout.addLayout(info_layout)
@@ -412,6 +520,17 @@ class MainWindow(QMainWindow):
             )
             finder_btn.clicked.connect(lambda: self.open_in_finder(movie_info['path']))
             buttons_layout.addWidget(finder_btn)
+
+            # Add Details button once the movie has been matched on IMDB
+            if 'title' in movie_info:
+                details_btn = QPushButton("ℹ Details")
+                details_btn.setFixedSize(90, 30)  # Fixed button size
+                details_btn.setStyleSheet(
+                    "QPushButton { background-color: #8e44ad; color: white; padding: 5px; border-radius: 3px; }"
+                    "QPushButton:hover { background-color: #7d3c98; }"
+                )
+                details_btn.clicked.connect(lambda: self.open_movie_details(movie_info['name']))
+                buttons_layout.addWidget(details_btn)
             
             buttons_layout.addStretch()
             right_layout.addLayout(buttons_layout)
@@ -420,13 +539,18 @@ class MainWindow(QMainWindow):
             movie_layout.addStretch()
 
             # Add to grid layout
-            self.movies_layout.addWidget(movie_widget, self.current_row, self.current_col)
             movie_widget.setProperty('movie_name', movie_info['name'].lower())
-            
-            # Update grid position
-            self.current_col = (self.current_col + 1) % 2
-            if self.current_col == 0:
-                self.current_row += 1
+            self.movie_infos[movie_info['name']] = movie_info
+            self.movie_widgets[movie_info['name']] = movie_widget
+            if position is not None:
+                self.movies_layout.addWidget(movie_widget, *position)
+            else:
+                self.movies_layout.addWidget(movie_widget, self.current_row, self.current_col)
+                
+                # Update grid position
+                self.current_col = (self.current_col + 1) % 2
+                if self.current_col == 0:
+                    self.current_row += 1
             
             # Force the layout to update
             self.movies_layout.update()
@@ -443,41 +567,198 @@ class MainWindow(QMainWindow):
                 item = self.movies_layout.takeAt(0)
                 if item.widget():
                     item.widget().deleteLater()
+        self.movie_infos.clear()
+        self.movie_widgets.clear()
+        self.thumbnail_labels.clear()
+        self.fetch_buttons.clear()
+        self.user_requested.clear()
         self.current_row = 0
         self.current_col = 0
 
     def fetch_movie_info(self, movie_name: str, fetch_button: QPushButton = None):
-        """Fetch IMDB info for a single movie."""
+        """Fetch IMDB info for a single movie ahead of everything else queued."""
         if fetch_button:
             fetch_button.setEnabled(False)
             fetch_button.setText("Fetching...")
+        self.user_requested.add(movie_name)
+        self.queue_movie_info(movie_name, PRIORITY_USER)
+
+    def queue_movie_info(self, movie_name: str, priority: int, budget: Optional[TimeBudget] = None):
+        self.work_queue.submit(
+            ('info', movie_name), self.imdb.get_movie_info, movie_name, True, False,
+            priority=priority, group=self.current_category, budget=budget,
+            callback=lambda info: self.work_signals.info_ready.emit(movie_name, info)
+        )
 
-        try:
-            info = self.imdb.get_movie_info(movie_name, force_update=True)
-            if info:
-                # Find and update the existing movie widget
-                for i in range(self.movies_layout.count()):
-                    widget = self.movies_layout.itemAt(i).widget()
-                    if widget and widget.property('movie_name') == movie_name.lower():
-                        # Remove the old widget
-                        widget.deleteLater()
-                        self.movies_layout.removeWidget(widget)
-                        # Add updated movie widget
-                        movie_info = {'name': movie_name}
-                        movie_info.update(info)
-                        self.add_movie(movie_info)
-                        break
+    def priority_for(self, movie_name: str) -> int:
+        if movie_name in self.user_requested:
+            return PRIORITY_USER
+        widget = self.movie_widgets.get(movie_name)
+        if widget is not None and self.is_in_viewport(widget):
+            return PRIORITY_VISIBLE
+        return PRIORITY_BACKGROUND
+
+    def is_in_viewport(self, widget: QWidget) -> bool:
+        if not widget.isVisible():
+            return False
+        viewport = self.scroll_area.viewport()
+        visible_rect = QRect(-self.movies_widget.x(), -self.movies_widget.y(),
+                             viewport.width(), viewport.height())
+        return visible_rect.intersects(widget.geometry())
+
+    def prioritize_visible(self, *args):
+        """Move queued work for on-screen cards ahead of cards below the fold."""
+        self.movies_layout.activate()
+        for movie_name in list(self.movie_widgets):
+            if movie_name in self.user_requested:
+                continue
+            priority = self.priority_for(movie_name)
+            for kind in ('info', 'thumbnail', 'poster'):
+                self.work_queue.reprioritize((kind, movie_name), priority)
+
+    def update_movie_widget(self, movie_name: str, info: Dict):
+        """Rebuild a movie card in place with new info."""
+        widget = self.movie_widgets.get(movie_name)
+        if widget is None:
+            return
+        index = self.movies_layout.indexOf(widget)
+        position = self.movies_layout.getItemPosition(index)[:2]
+        self.movies_layout.removeWidget(widget)
+        widget.deleteLater()
+        self.thumbnail_labels.pop(movie_name, None)
+        self.fetch_buttons.pop(movie_name, None)
+        movie_info = dict(self.movie_infos.get(movie_name, {'name': movie_name}))
+        movie_info.update(info)
+        self.add_movie(movie_info, position)
+        # Keep the rebuilt card consistent with the current search filter
+        new_widget = self.movie_widgets.get(movie_name)
+        if new_widget is not None and new_widget is not widget:
+            new_widget.setVisible(self.search_box.text().lower() in movie_name.lower())
+
+    def on_movie_info_ready(self, movie_name: str, info: Optional[Dict]):
+        if movie_name not in self.movie_widgets:
+            return
+        if info:
+            self.update_movie_widget(movie_name, info)
+            if info.get('cover_url') and not self.imdb.get_cached_thumbnail_path(movie_name):
+                self.work_queue.submit(
+                    ('thumbnail', movie_name), self.imdb.download_thumbnail, movie_name,
+                    priority=self.priority_for(movie_name), group=self.current_category,
+                    callback=lambda path: self.work_signals.thumbnail_ready.emit(movie_name, path)
+                )
             else:
-                if fetch_button:
-                    fetch_button.setText("Retry Fetch")
-                    fetch_button.setEnabled(True)
-
-        except Exception as e:
-            print(f"Error fetching movie info: {str(e)}")
+                self.user_requested.discard(movie_name)
+        else:
+            self.user_requested.discard(movie_name)
+            fetch_button = self.fetch_buttons.get(movie_name)
             if fetch_button:
                 fetch_button.setText("Retry Fetch")
                 fetch_button.setEnabled(True)
 
+    def on_thumbnail_ready(self, movie_name: str, thumbnail_path: Optional[str]):
+        if movie_name in self.movie_widgets and thumbnail_path:
+            # Rebuilding the card queues the poster decode
+            self.update_movie_widget(movie_name, {})
+        self.user_requested.discard(movie_name)
+
+    def on_poster_ready(self, movie_name: str, image: Optional[QImage]):
+        thumbnail_label = self.thumbnail_labels.get(movie_name)
+        if thumbnail_label is not None and image is not None:
+            thumbnail_label.setPixmap(QPixmap.fromImage(image))
+
+    def open_movie_details(self, movie_name: str):
+        """Load the heavy details (full plot, cast, genres, runtime) only when asked for."""
+        self.statusBar().showMessage(f"Loading details for {movie_name}...")
+        self.work_queue.submit(
+            ('details', movie_name), self.imdb.get_movie_details, movie_name,
+            # A direct request, so it survives switching category
+            priority=PRIORITY_USER, group=None,
+            callback=lambda details: self.work_signals.details_ready.emit(movie_name, details)
+        )
+
+    def on_movie_details_ready(self, movie_name: str, details: Optional[Dict]):
+        self.statusBar().clearMessage()
+        if not details:
+            QMessageBox.warning(self, "Details", f"Could not load details for {movie_name}")
+            return
+        movie_info = self.movie_infos.get(movie_name, {})
+        title = movie_info.get('title', movie_name)
+        if movie_info.get('year'):
+            title = f"{title} ({movie_info['year']})"
+        lines = [f"<b>{escape(title)}</b>"]
+        if details.get('genres'):
+            lines.append(f"Genres: {escape(', '.join(details['genres']))}")
+        if details.get('runtime'):
+            lines.append(f"Runtime: {escape(str(details['runtime']))} min")
+        if details.get('cast'):
+            lines.append(f"Cast: {escape(', '.join(name for name in details['cast'] if name))}")
+        if details.get('plot'):
+            lines.append(escape(details['plot']))
+        QMessageBox.information(self, "Details", "<br><br>".join(lines))
+
+    def toggle_offline_mode(self, enabled: bool):
+        self.offline_mode = enabled
+        self.imdb.set_offline(enabled)
+        self.save_config()
+        self.update_imdb_status()
+
+    def update_imdb_status(self, *args):
+        """Show whether IMDB is reachable, failing fast, or deliberately offline."""
+        state = self.imdb.breaker.state
+        if self.offline_mode:
+            text, color = "IMDB: offline mode", "gray"
+        elif state == CircuitBreaker.OPEN:
+            retry_in = int(self.imdb.breaker.retry_in())
+            text, color = f"IMDB: unavailable, retrying in {retry_in}s", "#c0392b"
+        elif state == CircuitBreaker.HALF_OPEN:
+            text, color = "IMDB: reconnecting...", "#d68910"
+        else:
+            text, color = "IMDB: online", "#27ae60"
+        self.imdb_status_label.setText(text)
+        self.imdb_status_label.setStyleSheet(f"color: {color}; font-size: 12px;")
+        # Tick the retry countdown while the circuit is open
+        if state == CircuitBreaker.OPEN and not self.offline_mode:
+            self.imdb_status_timer.start()
+        else:
+            self.imdb_status_timer.stop()
+
+    def toggle_catalog_server(self, enabled: bool):
+        self.catalog_server_port = self.server_port_input.value()
+        if enabled:
+            self.start_catalog_server()
+        else:
+            self.stop_catalog_server()
+        self.catalog_server_enabled = self.catalog_server is not None
+        self.save_config()
+
+    def start_catalog_server(self):
+        """Serve the catalog to other devices on the LAN."""
+        try:
+            self.catalog_server = CatalogServer(self.scanner, self.imdb, self.base_directory,
+                                                port=self.catalog_server_port)
+            self.catalog_server.start()
+            self.server_status_label.setText(f"Serving on port {self.catalog_server.port}")
+            self.server_port_input.setEnabled(False)
+        except Exception as e:
+            print(f"Error starting catalog server: {str(e)}")
+            self.catalog_server = None
+            self.server_checkbox.blockSignals(True)
+            self.server_checkbox.setChecked(False)
+            self.server_checkbox.blockSignals(False)
+            QMessageBox.warning(self, "Error", f"Error starting catalog server: {str(e)}")
+
+    def stop_catalog_server(self):
+        if self.catalog_server is not None:
+            self.catalog_server.stop()
+            self.catalog_server = None
+        self.server_status_label.setText("")
+        self.server_port_input.setEnabled(True)
+
+    def closeEvent(self, event):
+        self.work_queue.shutdown()
+        self.stop_catalog_server()
+        super().closeEvent(event)
+
     def open_in_finder(self, path: str):
         """Open the movie directory in Finder (macOS) or File Explorer (Windows)."""
         try:
@@ -523,3 +804,4 @@ class MainWindow(QMainWindow):
                 movie_name = widget.property('movie_name')
                 if movie_name:  # Check if property exists
                     widget.setVisible(text in movie_name)
+        self.prioritize_visible()